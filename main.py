@@ -1,201 +1,455 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import hashlib
+import html
+import io
+import os
 import subprocess
 import sys
-from collections import defaultdict
+from collections import Counter
 from datetime import datetime, timedelta
+from itertools import chain, groupby
+from operator import attrgetter
 from pathlib import Path
+from typing import Iterator, NamedTuple
 
 if sys.platform == "win32":
-    import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
+EPOCH = datetime(1970, 1, 1)
+CACHE_VERSION = 3
+
+
+def parse_tz_offset(tz: bytes) -> int:
+    seconds = int(tz[1:3]) * 3600 + int(tz[3:5]) * 60
+    return -seconds if tz[:1] == b"-" else seconds
+
+
+def get_mailmap_state(repo_path: Path) -> bytes:
+    # --author 匹配的是经 mailmap 映射后的作者，相关配置和文件内容都参与缓存键
+    config = subprocess.run(["git", "config", "--get-regexp", r"^(log\.mailmap|mailmap\.(file|blob))$"],
+                            cwd=repo_path, capture_output=True)
+    blobs = [b"HEAD:.mailmap"]
+    paths = [repo_path / ".mailmap"]
+    for line in config.stdout.splitlines():
+        name, _, value = line.partition(b" ")
+        if name == b"mailmap.blob":
+            blobs.append(value)
+        elif name == b"mailmap.file":
+            paths.append(repo_path / os.path.expanduser(os.fsdecode(value)))
+    
+    # 裸仓库默认读取 HEAD:.mailmap，非裸仓库读取工作区中的 .mailmap
+    check = subprocess.run(["git", "cat-file", "--batch-check=%(objectname)"], cwd=repo_path,
+                           input=b"\n".join(blobs) + b"\n", capture_output=True)
+    state = [config.stdout, check.stdout]
+    for path in paths:
+        try:
+            state.append(path.read_bytes())
+        except OSError:
+            state.append(b"")
+    return b"\0".join(state)
+
 
-def get_git_commits(repo_path: Path, repo_name: str = None, days: int = None, 
-                    since: str = None, until: str = None, author: str = None) -> list[tuple[datetime, int, str]]:
+def get_cache_state(repo_path: Path, cmd: list[str], since: str = None, until: str = None,
+                    author: str = None) -> tuple[str, tuple[bytes, ...]]:
+    # 解析后的绝对时间范围和浅克隆边界决定缓存是否可用，引用状态决定能否直接复用或增量更新
+    rev_cmd = ["git", "rev-parse", "--git-path", "shallow", "HEAD", "--all"]
+    if since:
+        rev_cmd.append(f"--since={since}")
+    if until:
+        rev_cmd.append(f"--until={until}")
+    
+    result = subprocess.run(rev_cmd, cwd=repo_path, capture_output=True)
+    if result.returncode != 0:
+        return None
+    
+    # 第一行是 shallow 文件路径；浅克隆加深（fetch --deepen 等）时引用不变，只有该文件会变化
+    shallow_path, *lines = result.stdout.splitlines()
+    try:
+        shallow = (repo_path / os.fsdecode(shallow_path)).read_bytes()
+    except OSError:
+        shallow = b""
+    
+    tips, filters = set(), [shallow]
+    for line in lines:
+        if line.startswith(b"--"):
+            filters.append(line)
+        else:
+            tips.add(line)
+    
+    if author:
+        filters.append(get_mailmap_state(repo_path))
+    
+    key = hashlib.sha1(b"\n".join(filters) + b"\0" + "\0".join(cmd).encode('utf-8')).hexdigest()
+    return key, tuple(sorted(tips))
+
+
+def is_reachable(repo_path: Path, tips: tuple[bytes, ...]) -> bool:
+    # 旧的引用全部仍可从当前引用到达（没有改写或删除历史）时返回 True
+    result = subprocess.run(["git", "rev-list", "--max-count=1", "--stdin", "--not", "--all", "HEAD"],
+                            cwd=repo_path, input=b"".join(tip + b"\n" for tip in tips), capture_output=True)
+    return result.returncode == 0 and not result.stdout
+
+
+def resolve_max_age(repo_path: Path, since: str) -> int:
+    # 由 git 解析日期表达式（与 git log --since 一致），输出形如 --max-age=<时间戳>
+    result = subprocess.run(["git", "rev-parse", f"--since={since}"], cwd=repo_path,
+                            capture_output=True, text=True)
+    option, _, value = result.stdout.strip().partition("=")
+    if result.returncode != 0 or option != "--max-age":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def get_cache_dir() -> Path:
+    # 用到缓存时才确定目录；无法确定主目录时不使用缓存
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        try:
+            cache_home = Path.home() / ".cache"
+        except (RuntimeError, KeyError):
+            return None
+    return Path(cache_home) / "git-commit-heatmap"
+
+
+def get_cache_path(repo_path: Path, repo_name: str, cmd: list[str]) -> Path:
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    digest = hashlib.sha1("\0".join([str(repo_path), repo_name, *cmd]).encode('utf-8')).hexdigest()
+    return cache_dir / f"{repo_name}-{digest[:16]}.pickle"
+
+
+def load_cached_counts(cache_path: Path, key: str) -> tuple[tuple[bytes, ...], dict[int, int]]:
+    import pickle
+    
+    try:
+        with cache_path.open("rb") as f:
+            cached_key, tips, counts = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, ValueError, TypeError):
+        return None
+    return (tips, counts) if cached_key == (CACHE_VERSION, key) else None
+
+
+def save_cached_counts(cache_path: Path, key: str, tips: tuple[bytes, ...], counts: dict[int, int]):
+    import pickle
+    
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("wb") as f:
+            pickle.dump(((CACHE_VERSION, key), tips, counts), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def is_git_repo(repo_path: Path) -> bool:
+    try:
+        os.stat(os.path.join(repo_path, ".git"))
+        return True
+    except OSError:
+        pass
+    # 裸仓库（如 git clone --bare / --mirror）没有工作区，只需要提交对象
+    return (repo_path / "HEAD").is_file() and (repo_path / "objects").is_dir()
+
+
+def get_git_commits(repo_path: Path, repo_name: str = None, cutoff_ts: float = None, 
+                    since: str = None, until: str = None, author: str = None,
+                    use_cache: bool = True) -> dict[int, int]:
     if repo_name is None:
         repo_name = repo_path.name
     
     try:
-        cmd = ["git", "log", "--format=%ai|%an", "--all"]
-        
-        if since:
-            cmd.extend(["--since", since])
+        # -z 以 NUL 分隔记录，字段间用 ASCII 单元分隔符 (0x1f)；
+        # 只需要作者时间戳和时区，作者过滤交给 git 的 --author（按 mailmap 映射后的作者匹配）
+        # 显式关闭签名校验，避免用户配置让 git 为每个提交做额外工作
+        cmd = ["git", "log", "-z", "--no-show-signature",
+               "--format=%at%x1f%ad", "--date=format:%z", "--all"]
+        
+        since_args = ["--since", since] if since else []
+        if cutoff_ts is not None:
+            # 让 git 按提交时间提前停止遍历；留一天余量覆盖作者时区偏移，
+            # 精确过滤仍在下方按作者本地时间进行
+            max_age = int(cutoff_ts) - 86400
+            if since:
+                # git 只采用最后一个时间下限，取两者中较晚的一个交给 git
+                since_age = resolve_max_age(repo_path, since)
+                if since_age is not None:
+                    max_age = max(max_age, since_age)
+                    since_args = []
+            # 解析失败时 --since 放在后面，仍以用户指定的为准
+            cmd.append(f"--max-age={max_age}")
+        cmd.extend(since_args)
         if until:
             cmd.extend(["--until", until])
         if author:
             cmd.extend(["--author", author])
         
-        result = subprocess.run(
-            cmd,
+        # --days 的截止时间依赖当前时间，结果不可缓存
+        state = None
+        exclude = None
+        if use_cache and cutoff_ts is None:
+            cache_path = get_cache_path(repo_path, repo_name, cmd)
+            if cache_path is not None:
+                state = get_cache_state(repo_path, cmd, since, until, author)
+        if state is not None:
+            cache_key, tips = state
+            cached = load_cached_counts(cache_path, cache_key)
+            if cached is not None:
+                cached_tips, cached_counts = cached
+                if cached_tips == tips:
+                    return cached_counts
+                # 只是新增了提交时，只遍历旧引用之后的部分并累加到缓存结果上；
+                # --since 会让 git 截断遍历，增量结果可能与完整遍历不同，此时重新统计
+                if not since and is_reachable(repo_path, cached_tips):
+                    exclude = b"".join(b"^" + tip + b"\n" for tip in cached_tips)
+        
+        proc = subprocess.Popen(
+            cmd if exclude is None else [*cmd, "--stdin"],
             cwd=repo_path,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            check=True,
+            stdin=subprocess.PIPE if exclude is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=1024 * 1024,
         )
+        if exclude is not None:
+            # git 读完 stdin 才开始输出，先全部写入再读取不会阻塞
+            try:
+                proc.stdin.write(exclude)
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        
+        counts = {}
+        # 时区取值很少，原始字段 -> 偏移秒数只解析一次
+        tz_offsets = {}
+        # 无 --days 时用 -inf 作下限，循环内只需一次比较
+        min_local_ts = cutoff_ts if cutoff_ts is not None else float("-inf")
+        pending = b""
+        while True:
+            # read1 只做一次底层读取，有数据即返回，解析与 git 输出交替进行
+            chunk = proc.stdout.read1(64 * 1024)
+            if not chunk:
+                break
+            records = (pending + chunk).split(b"\0")
+            pending = records.pop()
+            for record in records:
+                try:
+                    ts, sep, tz = record.partition(b"\x1f")
+                    if not sep:
+                        continue
+                    
+                    tz_offset = tz_offsets.get(tz)
+                    if tz_offset is None:
+                        tz_offset = tz_offsets[tz] = parse_tz_offset(tz)
+                    
+                    # 作者本地时间（与 %ai 一致），以 1970-01-01 起的秒数表示
+                    local_ts = int(ts) + tz_offset
+                    
+                    if local_ts < min_local_ts:
+                        continue
+                    
+                    # 按本地小时序号计数，拆分为日期和小时留到每个桶只做一次
+                    bucket = local_ts // 3600
+                    counts[bucket] = counts.get(bucket, 0) + 1
+                except ValueError:
+                    continue
         
-        commits = []
-        cutoff_date = None
-        if days:
-            cutoff_date = datetime.now() - timedelta(days=days)
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
         
-        if not result.stdout:
-            return commits
+        if exclude is not None:
+            # 新提交排在 git log 输出的前面，先放新的桶再合并旧结果，保持与完整遍历相同的顺序
+            for bucket, count in cached_counts.items():
+                counts[bucket] = counts.get(bucket, 0) + count
         
-        for line in result.stdout.strip().split("\n"):
-            if not line:
-                continue
-            try:
-                parts = line.split("|", 1)
-                if len(parts) < 2:
-                    continue
-                
-                dt_str = parts[0]
-                author_name = parts[1] if len(parts) > 1 else ""
-                
-                dt = datetime.strptime(dt_str[:19], "%Y-%m-%d %H:%M:%S")
-                
-                if cutoff_date and dt < cutoff_date:
-                    continue
-                
-                date_only = dt.replace(hour=0, minute=0, second=0, microsecond=0)
-                hour = dt.hour
-                commits.append((date_only, hour, repo_name))
-            except ValueError:
-                continue
+        if state is not None:
+            save_cached_counts(cache_path, cache_key, tips, counts)
         
-        return commits
+        return counts
     except subprocess.CalledProcessError as e:
         print(f"警告: 无法获取仓库 {repo_name} 的提交历史: {e}", file=sys.stderr)
-        return []
+        return {}
     except FileNotFoundError:
         print("错误: 未找到 git 命令，请确保已安装 Git", file=sys.stderr)
         sys.exit(1)
 
 
-def generate_heatmap(commits: list[tuple[datetime, int, str]]) -> tuple[dict[tuple[datetime, int], int], dict[tuple[datetime, int], dict[str, int]], dict[str, int]]:
-    heatmap = defaultdict(int)
-    repo_heatmap = defaultdict(lambda: defaultdict(int))
-    repo_stats = defaultdict(int)
+def fetch_repo_counts(repo_paths: list[Path], **options) -> Iterator[tuple[int, dict[int, int]]]:
+    if len(repo_paths) == 1:
+        yield 0, get_git_commits(repo_paths[0], repo_name=repo_paths[0].name, **options)
+        return
     
-    for date, hour, repo_name in commits:
-        heatmap[(date, hour)] += 1
-        repo_heatmap[(date, hour)][repo_name] += 1
-        repo_stats[repo_name] += 1
+    # 进程池只在多仓库时需要，单仓库和 --help 不必付出导入开销
+    from concurrent.futures import ProcessPoolExecutor, as_completed
     
-    return heatmap, repo_heatmap, repo_stats
+    # 输出解析在 Python 中完成，使用进程池让多个仓库真正并行；按完成顺序返回
+    # 按进程实际可用的 CPU 数（受 taskset / cgroup cpuset 限制）确定进程数，避免超额订阅
+    try:
+        cpu_count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_count = os.cpu_count() or 1
+    max_workers = min(len(repo_paths), cpu_count)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(get_git_commits, repo_path, repo_name=repo_path.name, **options): i
+            for i, repo_path in enumerate(repo_paths)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
 
 
-def print_heatmap_table(heatmap: dict[tuple[datetime, int], int], repo_stats: dict[str, int] = None):
-    if not heatmap:
-        print("没有数据可显示")
-        return
-    
-    dates = sorted(set(date for date, _ in heatmap.keys()))
-    
-    max_count = max(heatmap.values()) if heatmap else 1
+def generate_heatmap(repo_counts: list[tuple[str, dict[int, int]]]) -> tuple[dict[tuple[datetime, int], int], dict[tuple[datetime, int, int], int], Counter, list[str]]:
+    heatmap = Counter()
+    repo_heatmap = Counter()
+    repo_stats = Counter()
+    # 小时序号 -> (日期, 小时)，各仓库共享，每个桶只换算一次
+    cell_keys = {}
+    date_cache = {}
+    # 仓库名映射为小整数编号，按名称排序分配，编号顺序与名称顺序一致
+    repo_names = sorted({repo_name for repo_name, _ in repo_counts})
+    repo_ids = {repo_name: i for i, repo_name in enumerate(repo_names)}
     
-    def get_color(count: int) -> str:
-        if count == 0:
-            return "\033[38;5;232m"
-        elif count <= max_count * 0.25:
-            return "\033[38;5;22m"
-        elif count <= max_count * 0.5:
-            return "\033[38;5;28m"
-        elif count <= max_count * 0.75:
-            return "\033[38;5;34m"
-        else:
-            return "\033[38;5;40m"
-    
-    reset_color = "\033[0m"
+    # 三个统计结果在同一次遍历中完成
+    for repo_name, counts in repo_counts:
+        repo_id = repo_ids[repo_name]
+        for bucket, count in counts.items():
+            key = cell_keys.get(bucket)
+            if key is None:
+                day, hour = divmod(bucket, 24)
+                date = date_cache.get(day)
+                if date is None:
+                    date = date_cache[day] = EPOCH + timedelta(days=day)
+                key = cell_keys[bucket] = (date, hour)
+            heatmap[key] = heatmap.get(key, 0) + count
+            repo_key = (*key, repo_id)
+            repo_heatmap[repo_key] = repo_heatmap.get(repo_key, 0) + count
+        # 没有提交的仓库不计入统计，与逐条计数时一致
+        if counts:
+            repo_stats[repo_name] += sum(counts.values())
     
-    print("\n" + " " * 6, end="")
-    for date in dates:
-        date_str = date.strftime("%m-%d")
-        print(f"{date_str:>6}", end="")
-    print()
-    
-    for hour in range(24):
-        print(f"{hour:2} ", end="")
-        for date in dates:
-            count = heatmap.get((date, hour), 0)
-            color = get_color(count)
-            if count == 0:
-                block = "  "
-            elif count < 10:
-                block = f"{count:2}"
-            else:
-                block = "++"
-            print(f"{color}{block}{reset_color}", end="  ")
-        print()
+    return heatmap, repo_heatmap, repo_stats, repo_names
+
+
+class HeatmapView(NamedTuple):
+    dates: list[datetime]
+    # 日期 -> ("%m-%d", "%Y-%m-%d") 格式化结果
+    date_labels: dict[datetime, tuple[str, str]]
+    # grid[hour][i] 为 dates[i] 当天该小时的提交数，渲染时按行直接取值
+    grid: list[list[int]]
+    # 与 grid 同形，每个单元格的颜色等级（0-4）
+    levels: list[list[int]]
+    # 提交最多的单元格 ((日期, 小时), 提交数)
+    max_cell: tuple[tuple[datetime, int], int]
+
+
+def find_max_cell(heatmap: dict[tuple[datetime, int], int]) -> tuple[tuple[datetime, int], int]:
+    max_key, max_count = None, -1
+    for key, count in heatmap.items():
+        if count > max_count:
+            max_key, max_count = key, count
+    return max_key, max_count
+
+
+def count_level(count: int, max_count: int) -> int:
+    # 等价于按 0 / ≤25% / ≤50% / ≤75% / 其余 分级，全部使用整数比较
+    return (count > 0) + (count * 4 > max_count) + (count * 2 > max_count) + (count * 4 > max_count * 3)
+
+
+def build_heatmap_view(heatmap: dict[tuple[datetime, int], int]) -> HeatmapView:
+    dates = sorted({date for date, _ in heatmap})
+    date_index = {date: i for i, date in enumerate(dates)}
+    date_labels = {date: (date.strftime("%m-%d"), date.strftime("%Y-%m-%d")) for date in dates}
     
-    total_commits = sum(heatmap.values())
-    print(f"\n总提交数: {total_commits}")
+    grid = [[0] * len(dates) for _ in range(24)]
+    for (date, hour), count in heatmap.items():
+        grid[hour][date_index[date]] = count
     
-    if repo_stats and len(repo_stats) > 1:
-        print("\n各仓库提交统计:")
-        for repo_name, count in sorted(repo_stats.items(), key=lambda x: x[1], reverse=True):
-            percentage = (count / total_commits * 100) if total_commits > 0 else 0
-            print(f"  {repo_name}: {count} 次 ({percentage:.1f}%)")
+    # 等级只取决于提交数，每个取值只计算一次
+    max_cell = find_max_cell(heatmap)
+    max_count = max_cell[1] if heatmap else 1
+    level_of = [count_level(count, max_count) for count in range(max_count + 1)]
+    levels = [[level_of[count] for count in row] for row in grid]
     
-    print(f"显示日期范围: {dates[0].strftime('%Y-%m-%d')} 至 {dates[-1].strftime('%Y-%m-%d')}")
-    print(f"共 {len(dates)} 天有提交记录")
-    
-    if heatmap:
-        max_key = max(heatmap.items(), key=lambda x: x[1])
-        date, hour = max_key[0]
-        print(f"最活跃时段: {date.strftime('%Y-%m-%d')} {hour}时 ({max_key[1]} 次提交)")
+    return HeatmapView(dates, date_labels, grid, levels, max_cell)
 
 
-def print_heatmap_table_plain(heatmap: dict[tuple[datetime, int], int], repo_stats: dict[str, int] = None):
+def print_heatmap_table(heatmap: dict[tuple[datetime, int], int], view: HeatmapView, repo_stats: Counter = None, color: bool = True):
     if not heatmap:
         print("没有数据可显示")
         return
     
-    dates = sorted(set(date for date, _ in heatmap.keys()))
+    buf = []
+    dates, date_labels, grid, levels, max_key = view
+    
+    colors = ("\033[38;5;232m", "\033[38;5;22m", "\033[38;5;28m", "\033[38;5;34m", "\033[38;5;40m")
+    
+    reset_color = "\033[0m"
+    
+    # 彩色输出为色块，每列宽 6；纯文本输出为数字，每列宽 8
+    width = 6 if color else 8
     
-    print("\n" + " " * 6, end="")
+    buf.append("\n" + " " * 6)
     for date in dates:
-        date_str = date.strftime("%m-%d")
-        print(f"{date_str:>8}", end="")
-    print()
+        date_str = date_labels[date][0]
+        buf.append(f"{date_str:>{width}}")
+    buf.append("\n")
+    
+    # 单元格文本（含颜色）只取决于提交数，每个取值只格式化一次
+    cells = {}
+    for count, level in zip(chain.from_iterable(grid), chain.from_iterable(levels)):
+        if count in cells:
+            continue
+        if not color:
+            cells[count] = f"{count:8}"
+            continue
+        if count == 0:
+            block = "  "
+        elif count < 10:
+            block = f"{count:2}"
+        else:
+            block = "++"
+        cells[count] = f"{colors[level]}{block}{reset_color}  "
     
     for hour in range(24):
-        print(f"{hour:2} ", end="")
-        for date in dates:
-            count = heatmap.get((date, hour), 0)
-            print(f"{count:8}", end="")
-        print()
+        buf.append(f"{hour:2} ")
+        buf.append("".join([cells[count] for count in grid[hour]]))
+        buf.append("\n")
     
     total_commits = sum(heatmap.values())
-    print(f"\n总提交数: {total_commits}")
+    buf.append(f"\n总提交数: {total_commits}\n")
     
     if repo_stats and len(repo_stats) > 1:
-        print("\n各仓库提交统计:")
-        for repo_name, count in sorted(repo_stats.items(), key=lambda x: x[1], reverse=True):
+        buf.append("\n各仓库提交统计:\n")
+        for repo_name, count in repo_stats.most_common():
             percentage = (count / total_commits * 100) if total_commits > 0 else 0
-            print(f"  {repo_name}: {count} 次 ({percentage:.1f}%)")
+            buf.append(f"  {repo_name}: {count} 次 ({percentage:.1f}%)\n")
     
-    print(f"显示日期范围: {dates[0].strftime('%Y-%m-%d')} 至 {dates[-1].strftime('%Y-%m-%d')}")
-    print(f"共 {len(dates)} 天有提交记录")
+    buf.append(f"显示日期范围: {date_labels[dates[0]][1]} 至 {date_labels[dates[-1]][1]}\n")
+    buf.append(f"共 {len(dates)} 天有提交记录\n")
     
     if heatmap:
-        max_key = max(heatmap.items(), key=lambda x: x[1])
         date, hour = max_key[0]
-        print(f"最活跃时段: {date.strftime('%Y-%m-%d')} {hour}时 ({max_key[1]} 次提交)")
+        buf.append(f"最活跃时段: {date_labels[date][1]} {hour}时 ({max_key[1]} 次提交)\n")
+    
+    sys.stdout.write("".join(buf))
 
 
-def generate_html_heatmap(heatmap: dict[tuple[datetime, int], int], output_path: Path, repo_stats: dict[str, int] = None, repo_heatmap: dict[tuple[datetime, int], dict[str, int]] = None):
+def generate_html_heatmap(heatmap: dict[tuple[datetime, int], int], view: HeatmapView, output_path: Path, repo_stats: Counter = None, repo_heatmap: dict[tuple[datetime, int, int], int] = None, repo_names: list[str] = None):
     if not heatmap:
         print("没有数据可显示")
         return
     
-    dates = sorted(set(date for date, _ in heatmap.keys()))
-    max_count = max(heatmap.values()) if heatmap else 1
+    dates, date_labels, grid, levels, max_key = view
     
-    html = """<!DOCTYPE html>
+    parts = ["""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
@@ -679,108 +933,103 @@ def generate_html_heatmap(heatmap: dict[tuple[datetime, int], int], output_path:
                     <thead>
                         <tr>
                             <th class="year-header"></th>
-"""
-    
-    from collections import defaultdict
-    year_counts = defaultdict(int)
-    for date in dates:
-        year = date.year
-        year_counts[year] += 1
+"""]
     
-    current_year = None
-    year_start_idx = 0
-    year_colspans = []
-    for i, date in enumerate(dates):
-        year = date.year
-        if year != current_year:
-            if current_year is not None:
-                colspan = i - year_start_idx
-                year_colspans.append((current_year, colspan))
-            current_year = year
-            year_start_idx = i
-    
-    if current_year is not None:
-        colspan = len(dates) - year_start_idx
-        year_colspans.append((current_year, colspan))
+    year_colspans = [(year, len(list(group))) for year, group in groupby(dates, key=attrgetter('year'))]
     
     for year, colspan in year_colspans:
-        html += f'                            <th class="year-header" colspan="{colspan}"><span class="year-text">{year}</span></th>\n'
+        parts.append(f'                            <th class="year-header" colspan="{colspan}"><span class="year-text">{year}</span></th>\n')
     
-    html += """                        </tr>
+    parts.append("""                        </tr>
                         <tr>
                             <th></th>
-"""
+""")
     
     prev_year = None
     for i, date in enumerate(dates):
-        date_str = date.strftime("%m-%d")
+        date_str = date_labels[date][0]
         current_year = date.year
         is_year_boundary = prev_year is not None and current_year != prev_year
         class_attr = ' class="date-header"' if is_year_boundary else ''
-        html += f'                            <th{class_attr}>{date_str}</th>\n'
+        parts.append(f'                            <th{class_attr}>{date_str}</th>\n')
         prev_year = current_year
     
-    html += """                        </tr>
+    parts.append("""                        </tr>
                     </thead>
                     <tbody>
-"""
+""")
+    
+    date_strs = [date_labels[date][1] for date in dates]
+    # 空单元格只有小时不同，按日期预先生成模板
+    zero_cells = [
+        f'<td><div class="cell level-0"><div class="tooltip"><div class="tooltip-header">{date_str} {{hour}}时</div><div class="tooltip-total">总计: 0 次提交</div></div></div></td>'
+        for date_str in date_strs
+    ]
+    
+    cell_prefixes = tuple(
+        f'<td><div class="cell level-{level}"><div class="tooltip">'
+        for level in range(5)
+    )
     
+    # 每个仓库的提示行前缀（含转义后的仓库名）只生成一次，按编号索引
+    repo_row_prefixes = [
+        f'<div class="tooltip-row"><span class="tooltip-repo">{html.escape(repo_name)}</span><span class="tooltip-count">'
+        for repo_name in repo_names or ()
+    ]
+    
+    # 将扁平的 (日期, 小时, 仓库编号) 计数按单元格归组，编号按名称分配，组内即按仓库名排序
+    repo_items = {}
+    if repo_heatmap:
+        for (date, hour, repo_id), repo_count in sorted(repo_heatmap.items()):
+            repo_items.setdefault((date, hour), []).append(f'{repo_row_prefixes[repo_id]}{repo_count} 次</span></div>')
+    
+    # 每行的单元格拼接成一行输出，不再逐个单元格缩进换行
     for hour in range(24):
-        html += f'                        <tr><td>{hour:2}</td>\n'
-        for date in dates:
-            count = heatmap.get((date, hour), 0)
+        row = []
+        level_row = levels[hour]
+        for i, count in enumerate(grid[hour]):
             if count == 0:
-                level = 0
-            elif count <= max_count * 0.25:
-                level = 1
-            elif count <= max_count * 0.5:
-                level = 2
-            elif count <= max_count * 0.75:
-                level = 3
-            else:
-                level = 4
+                row.append(zero_cells[i].format(hour=hour))
+                continue
             
-            date_str = date.strftime("%Y-%m-%d")
+            date = dates[i]
+            date_str = date_strs[i]
             
-            if repo_heatmap and (date, hour) in repo_heatmap:
-                repo_details = repo_heatmap[(date, hour)]
-                repo_items = []
-                for repo_name, repo_count in sorted(repo_details.items()):
-                    repo_items.append(f'<div class="tooltip-row"><span class="tooltip-repo">{repo_name}</span><span class="tooltip-count">{repo_count} 次</span></div>')
-                tooltip_text = f'<div class="tooltip-header">{date_str} {hour}时</div><div class="tooltip-total">总计: {count} 次提交</div><div class="tooltip-repos">' + ''.join(repo_items) + '</div>'
+            cell_repo_items = repo_items.get((date, hour))
+            if cell_repo_items:
+                tooltip_text = f'<div class="tooltip-header">{date_str} {hour}时</div><div class="tooltip-total">总计: {count} 次提交</div><div class="tooltip-repos">' + ''.join(cell_repo_items) + '</div>'
             else:
                 tooltip_text = f'<div class="tooltip-header">{date_str} {hour}时</div><div class="tooltip-total">总计: {count} 次提交</div>'
             
-            html += f'                            <td><div class="cell level-{level}"><div class="tooltip">{tooltip_text}</div></div></td>\n'
-        html += '                        </tr>\n'
+            row.append(f'{cell_prefixes[level_row[i]]}{tooltip_text}</div></div></td>')
+        parts.append(f'                        <tr><td>{hour:2}</td>{"".join(row)}</tr>\n')
     
-    html += """                    </tbody>
+    parts.append("""                    </tbody>
                 </table>
             </div>
         </div>
         
         <div class="stats">
-"""
+""")
     
     total_commits = sum(heatmap.values())
-    html += f'            <p>总提交数: <strong>{total_commits}</strong></p>\n'
+    parts.append(f'            <p>总提交数: <strong>{total_commits}</strong></p>\n')
     
     if repo_stats and len(repo_stats) > 1:
-        html += '            <p>各仓库提交统计:</p><ul>\n'
-        for repo_name, count in sorted(repo_stats.items(), key=lambda x: x[1], reverse=True):
+        parts.append('            <p>各仓库提交统计:</p><ul>\n')
+        for repo_name, count in repo_stats.most_common():
             percentage = (count / total_commits * 100) if total_commits > 0 else 0
-            html += f'                <li><strong>{repo_name}</strong>: {count} 次 ({percentage:.1f}%)</li>\n'
-        html += '            </ul>\n'
+            parts.append(f'                <li><strong>{html.escape(repo_name)}</strong>: {count} 次 ({percentage:.1f}%)</li>\n')
+        parts.append('            </ul>\n')
     
-    html += f'            <p>显示日期范围: <strong>{dates[0].strftime("%Y-%m-%d")}</strong> 至 <strong>{dates[-1].strftime("%Y-%m-%d")}</strong></p>\n'
-    html += f'            <p>共 <strong>{len(dates)}</strong> 天有提交记录</p>\n'
+    parts.append(f'            <p>显示日期范围: <strong>{date_labels[dates[0]][1]}</strong> 至 <strong>{date_labels[dates[-1]][1]}</strong></p>\n')
+    parts.append(f'            <p>共 <strong>{len(dates)}</strong> 天有提交记录</p>\n')
     
     if heatmap:
-        max_key = max(heatmap.items(), key=lambda x: x[1])
         date, hour = max_key[0]
-        html += f'            <p>最活跃时段: <strong>{date.strftime("%Y-%m-%d")} {hour}时</strong> ({max_key[1]} 次提交)</p>\n'
+        parts.append(f'            <p>最活跃时段: <strong>{date_labels[date][1]} {hour}时</strong> ({max_key[1]} 次提交)</p>\n')
     
-    html += """        </div>
+    parts.append("""        </div>
         
         <div class="legend">
             <span>图例:</span>
@@ -922,9 +1171,11 @@ def generate_html_heatmap(heatmap: dict[tuple[datetime, int], int], output_path:
         })();
     </script>
 </body>
-</html>"""
+</html>""")
     
-    output_path.write_text(html, encoding='utf-8')
+    # 逐段编码写入，避免同时持有完整的 str 文档和其编码副本
+    with output_path.open("wb", buffering=1024 * 1024) as f:
+        f.writelines(part.encode('utf-8') for part in parts)
     print(f"\nHTML 文件已生成: {output_path}")
 
 
@@ -962,22 +1213,31 @@ def main():
     parser.add_argument('--since', type=str, metavar='DATE', help='只显示指定日期之后的提交（格式：YYYY-MM-DD 或相对时间如 "2 weeks ago"）')
     parser.add_argument('--until', type=str, metavar='DATE', help='只显示指定日期之前的提交（格式：YYYY-MM-DD 或相对时间如 "1 week ago"）')
     parser.add_argument('--author', type=str, metavar='PATTERN', help='只显示指定作者的提交（支持正则表达式）')
+    parser.add_argument('--no-cache', action='store_true', help='不读取也不写入提交统计缓存')
     args = parser.parse_args()
     
     repo_paths = []
     if args.repos:
+        seen_paths = set()
         for repo_str in args.repos:
-            repo_path = Path(repo_str).resolve()
-            if not repo_path.exists():
-                print(f"警告: 仓库路径不存在: {repo_path}", file=sys.stderr)
+            # abspath 只做字符串处理；resolve() 会逐级查询每个路径组件
+            repo_path = Path(os.path.abspath(repo_str))
+            # 同一仓库重复指定时只统计一次，避免多启动一个 git 进程并重复计数
+            if repo_path in seen_paths:
+                print(f"警告: 重复的仓库路径，已忽略: {repo_path}", file=sys.stderr)
                 continue
-            if not (repo_path / ".git").exists():
-                print(f"警告: 不是有效的 Git 仓库: {repo_path}", file=sys.stderr)
+            seen_paths.add(repo_path)
+            # 常见情况下只需一次 stat；路径是否存在只在失败时才检查
+            if not is_git_repo(repo_path):
+                if not repo_path.exists():
+                    print(f"警告: 仓库路径不存在: {repo_path}", file=sys.stderr)
+                else:
+                    print(f"警告: 不是有效的 Git 仓库: {repo_path}", file=sys.stderr)
                 continue
             repo_paths.append(repo_path)
     else:
         repo_path = Path.cwd()
-        if (repo_path / ".git").exists():
+        if is_git_repo(repo_path):
             repo_paths.append(repo_path)
         else:
             print("错误: 当前目录不是 Git 仓库，请使用 --repo 参数指定仓库路径", file=sys.stderr)
@@ -987,31 +1247,43 @@ def main():
         print("错误: 没有有效的仓库路径", file=sys.stderr)
         sys.exit(1)
     
-    all_commits = []
+    # --days 的截止时间只计算一次，所有仓库使用同一时刻（作者本地时间，1970-01-01 起的秒数）
+    cutoff_ts = None
+    if args.days:
+        cutoff_ts = (datetime.now() - timedelta(days=args.days) - EPOCH).total_seconds()
+    
+    fetch_options = dict(cutoff_ts=cutoff_ts, since=args.since, until=args.until,
+                         author=args.author, use_cache=not args.no_cache)
+    
+    # 先列出所有要分析的仓库作为进度提示；在创建工作进程前刷新，避免缓冲内容被子进程继承
     for repo_path in repo_paths:
-        repo_name = repo_path.name
-        print(f"正在分析仓库: {repo_path} ({repo_name})")
-        commits = get_git_commits(repo_path, repo_name=repo_name, days=args.days, 
-                                 since=args.since, until=args.until, author=args.author)
-        all_commits.extend(commits)
-        print(f"  找到 {len(commits)} 个提交")
+        print(f"正在分析仓库: {repo_path} ({repo_path.name})")
+    sys.stdout.flush()
+    
+    repo_counts = [None] * len(repo_paths)
+    total_commits = 0
+    for i, counts in fetch_repo_counts(repo_paths, **fetch_options):
+        repo_name = repo_paths[i].name
+        repo_counts[i] = (repo_name, counts)
+        commit_count = sum(counts.values())
+        total_commits += commit_count
+        # 按完成顺序输出，每行带上仓库名以对应上面的列表
+        print(f"  {repo_name}: 找到 {commit_count} 个提交")
     
-    if not all_commits:
+    if not total_commits:
         print("未找到任何提交记录")
         return
     
-    print(f"\n总共找到 {len(all_commits)} 个提交")
+    print(f"\n总共找到 {total_commits} 个提交")
     
-    heatmap, repo_heatmap, repo_stats = generate_heatmap(all_commits)
+    heatmap, repo_heatmap, repo_stats, repo_names = generate_heatmap(repo_counts)
+    view = build_heatmap_view(heatmap)
     
     if args.html:
         output_path = Path(args.html)
-        generate_html_heatmap(heatmap, output_path, repo_stats, repo_heatmap)
+        generate_html_heatmap(heatmap, view, output_path, repo_stats, repo_heatmap, repo_names)
     else:
-        if sys.stdout.isatty():
-            print_heatmap_table(heatmap, repo_stats)
-        else:
-            print_heatmap_table_plain(heatmap, repo_stats)
+        print_heatmap_table(heatmap, view, repo_stats, color=sys.stdout.isatty())
 
 
 if __name__ == "__main__":